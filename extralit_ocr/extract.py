@@ -1,9 +1,17 @@
 from __future__ import annotations
 
+import ctypes
 import hashlib
 import logging
+import multiprocessing
 import os
+import signal
+import sys
+import tempfile
 import time
+from collections import OrderedDict
+from collections.abc import Iterator
+from contextlib import contextmanager
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any, Optional
@@ -18,6 +26,33 @@ LOGGER = logging.getLogger(__name__)
 # ---------------------------------------------------------------------------
 
 
+_CGROUP_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+
+
+def _available_cpus() -> int:
+    """
+    CPUs this process may actually use. os.cpu_count() reports the host's cores; containers
+    (e.g. a 2-vCPU Space on a many-core host) are limited by the affinity mask or a cgroup v2 quota.
+    """
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    try:
+        quota, period = Path(_CGROUP_CPU_MAX).read_text().split()
+        if quota != "max":
+            cpus = min(cpus, max(int(quota) // int(period), 1))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def _default_page_workers() -> int:
+    """
+    Share the CPUs between the RQ workers started by the Procfile (OCR_NUM_WORKERS), each of
+    which runs its own page pool, so concurrent jobs don't oversubscribe the machine.
+    """
+    rq_workers = max(int(os.getenv("OCR_NUM_WORKERS") or 1), 1)
+    return max(_available_cpus() // rq_workers, 1)
+
+
 @dataclass
 class ExtractionConfig:
     write_dir: Optional[Path | str] = None
@@ -27,6 +62,10 @@ class ExtractionConfig:
     header_detection_body_limit: int = 10
     safe_filename_timestamp: bool = True
     safe_filename_hash_len: int = 8
+    # processes used to render page ranges concurrently (1 disables page parallelism)
+    page_workers: int = field(default_factory=_default_page_workers)
+    # fsync markdown files and their directory after writing (slower, survives power loss)
+    durable_writes: bool = False
 
     # internal cached Path (not user supplied directly)
     _write_dir_path: Optional[Path] = field(init=False, default=None, repr=False)
@@ -34,6 +73,8 @@ class ExtractionConfig:
     def __post_init__(self):
         if self.write_mode not in {"overwrite", "skip"}:
             raise ValueError("write_mode must be 'overwrite' or 'skip'")
+        if self.page_workers < 1:
+            raise ValueError("page_workers must be >= 1")
         if self.write_dir:
             self._write_dir_path = Path(self.write_dir).expanduser().resolve()
             self._write_dir_path.mkdir(parents=True, exist_ok=True)
@@ -47,6 +88,8 @@ def _default_config_from_env() -> ExtractionConfig:
     return ExtractionConfig(
         write_dir=os.getenv("PDF_MARKDOWN_WRITE_DIR") or None,
         write_mode=os.getenv("PDF_MARKDOWN_WRITE_MODE", "overwrite"),
+        page_workers=int(os.getenv("PDF_PAGE_WORKERS") or _default_page_workers()),
+        durable_writes=os.getenv("PDF_MARKDOWN_DURABLE", "0") == "1",
     )
 
 
@@ -67,7 +110,11 @@ def _safe_filename(
     parts = [stem]
 
     if hash_len > 0:
-        digest = hashlib.sha1(original_name.encode("utf-8", errors="ignore")).hexdigest()[:hash_len]
+        # Non-cryptographic disambiguation tag only; BLAKE2b sized to the tag is cheaper than SHA-1.
+        digest = hashlib.blake2b(
+            original_name.encode("utf-8", errors="ignore"),
+            digest_size=min(max((hash_len + 1) // 2, 1), 64),
+        ).hexdigest()[:hash_len]
         parts.append(digest)
 
     if include_timestamp:
@@ -76,6 +123,26 @@ def _safe_filename(
     return "-".join(parts) + suffix
 
 
+# Characters encoded per write; bounds the transient bytes copy for large outputs.
+_WRITE_CHUNK_CHARS = 1 << 20
+
+
+def _stream_write_text(out_path: Path, text: str, durable: bool = False) -> None:
+    """
+    Write ``text`` as UTF-8 in fixed-size slices instead of encoding it all at once.
+    """
+    with open(out_path, "wb", buffering=_WRITE_CHUNK_CHARS) as f:
+        for start in range(0, len(text), _WRITE_CHUNK_CHARS):
+            f.write(text[start : start + _WRITE_CHUNK_CHARS].encode("utf-8"))
+        f.flush()
+        if durable:
+            os.fsync(f.fileno())
+            # The pages are clean after fsync, so DONTNEED can drop them (it skips dirty pages);
+            # the markdown is not read back by this process.
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+
 def _write_markdown_if_configured(
     markdown_text: str,
     original_filename: str,
@@ -98,7 +165,23 @@ def _write_markdown_if_configured(
         LOGGER.debug("Skipping existing markdown file (skip mode): %s", out_path)
         return str(out_path)
 
-    out_path.write_text(markdown_text, encoding="utf-8")
+    # Write to a temp file and rename, so a crash never leaves a truncated file that
+    # "skip" mode would later mistake for a complete extraction.
+    tmp_path = out_path.with_name(f"{out_path.name}.tmp.{os.getpid()}")
+    try:
+        _stream_write_text(tmp_path, markdown_text, durable=config.durable_writes)
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    if config.durable_writes:
+        dir_fd = os.open(write_dir, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
     LOGGER.debug(
         "Wrote markdown output: %s (%d chars)",
         out_path,
@@ -107,81 +190,312 @@ def _write_markdown_if_configured(
     return str(out_path)
 
 
-def extract_markdown_with_hierarchy(
+# Smallest page range worth shipping to a separate process; below this the
+# pool start-up and pickling overhead outweighs the parallel speedup.
+_MIN_PAGES_PER_WORKER = 8
+
+
+def _page_ranges(page_count: int, workers: int) -> list[list[int]]:
+    """
+    Split ``range(page_count)`` into ``workers`` contiguous, near-equal page lists.
+    """
+    size, extra = divmod(page_count, workers)
+    ranges = []
+    start = 0
+    for i in range(workers):
+        end = start + size + (1 if i < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+
+# RAM-backed directory for handing PDFs to page workers; falls back to the default temp dir.
+_SHM_DIR = "/dev/shm"
+
+
+@contextmanager
+def _spill_pdf(file_bytes: bytes) -> Iterator[str]:
+    """
+    Write the PDF once to a temp file that worker processes open by path, instead of
+    pickling a copy of the bytes to every worker. The file is removed on exit.
+    """
+    candidates = [_SHM_DIR, None] if os.path.isdir(_SHM_DIR) else [None]
+    for tmp_dir in candidates:
+        path = None
+        try:
+            fd, path = tempfile.mkstemp(suffix=".pdf", prefix="extralit-ocr-", dir=tmp_dir)
+            with os.fdopen(fd, "wb") as f:
+                f.write(file_bytes)
+            break
+        except OSError:
+            # e.g. /dev/shm is read-only or too small for this PDF (64 MB by default in Docker)
+            if path is not None:
+                os.unlink(path)
+            if tmp_dir is None:
+                raise
+    try:
+        yield path
+    finally:
+        os.unlink(path)
+
+
+_PR_SET_PDEATHSIG = 1
+
+
+def _die_with_parent(parent_pid: int) -> None:
+    """
+    Page worker initializer: get SIGKILLed when the job process dies.
+
+    RQ's forking Worker SIGKILLs a work horse that overruns its timeout; without this,
+    page workers would be reparented to init and keep rendering.
+
+    Forked workers also inherit the worker's Python signal handlers (RQ's warm shutdown
+    handler under SimpleOCRWorker), which would turn the SIGTERM sent by Pool.terminate()
+    into a shutdown request on the live worker and leave the pool waiting forever.
+    """
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if sys.platform.startswith("linux"):
+        ctypes.CDLL(None, use_errno=True).prctl(_PR_SET_PDEATHSIG, signal.SIGKILL)
+    if os.getppid() != parent_pid:  # parent already died before prctl took effect
+        os._exit(1)
+
+
+def _render_pages(
+    pdf_path: str,
+    pages: list[int],
+    hdr_info: Any,
+    margins: tuple[int, int, int, int],
+) -> str:
+    """
+    Process-pool entry point: open the spilled PDF and render the given pages to markdown.
+    """
+    with fitz.open(pdf_path) as doc:
+        return pymupdf4llm.to_markdown(doc, pages=pages, hdr_info=hdr_info, margins=margins)
+
+
+def _render(
+    doc: fitz.Document,
     file_bytes: bytes,
-    original_filename: str,
-    *,
-    config: Optional[ExtractionConfig] = None,
-) -> tuple[str, dict[str, Any]]:
+    hdr_info: Any,
+    config: ExtractionConfig,
+) -> str:
     """
-    Extract hierarchical Markdown from a PDF (bytes) using either the embedded
-    Table of Contents (TOC) or a heuristic header identification fallback.
+    Render the whole document, splitting it into page ranges across processes when large enough.
 
-    Args:
-        file_bytes: Raw PDF bytes.
-        original_filename: Original name (used only for generated markdown filename).
-        config: Optional ExtractionConfig. If omitted, environment-derived default is used.
+    PyMuPDF is not thread-safe, so each worker process reopens the PDF from a shared
+    temp file. The header info objects are plain Python data and are pickled as-is.
 
-    Returns:
-        A tuple: (markdown_text, metadata_dict)
+    Leaving the pool context terminates the workers, so an RQ job timeout (raised from
+    SIGALRM while waiting on the pool) stops the page workers immediately instead of
+    waiting for them to finish.
+    """
+    workers = min(config.page_workers, doc.page_count // _MIN_PAGES_PER_WORKER)
+    if workers <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        return pymupdf4llm.to_markdown(doc, hdr_info=hdr_info, margins=config.margins)
+
+    LOGGER.debug("Rendering %d pages across %d processes", doc.page_count, workers)
+    # fork explicitly: _die_with_parent expects the job process to be the worker's parent,
+    # which is not the case under forkserver (the Linux default from Python 3.14) or spawn
+    mp_context = multiprocessing.get_context("fork")
+    with (
+        _spill_pdf(file_bytes) as pdf_path,
+        mp_context.Pool(workers, initializer=_die_with_parent, initargs=(os.getpid(),)) as pool,
+    ):
+        tasks = [(pdf_path, pages, hdr_info, config.margins) for pages in _page_ranges(doc.page_count, workers)]
+        # Pool.__exit__ calls terminate(), which also covers exceptions raised while waiting here
+        chunks = pool.starmap(_render_pages, tasks, chunksize=1)
+    # to_markdown concatenates page outputs without a separator
+    return "".join(chunks)
+
+
+# Content-addressed caches keyed by a digest of the PDF bytes, so retries and duplicate
+# uploads skip PyMuPDF work. They live in process memory: they only help callers that
+# extract in a long-lived process (SimpleOCRWorker, direct library use). The default forking
+# OCRWorker runs each job in a fresh work horse, so its caches are discarded after every job.
+# Markdown values exclude the per-call output path and are bounded by total characters.
+_MARKDOWN_CACHE: OrderedDict[tuple, tuple[str, dict[str, Any]]] = OrderedDict()
+_MARKDOWN_CACHE_MAX_ENTRIES = 32
+_MARKDOWN_CACHE_MAX_CHARS = 16_000_000
+# IdentifyHeaders scans every page's fonts, which is pathologically slow on some PDFs.
+# It only holds font-size statistics, so it can be reused for any render of the same bytes,
+# but only within one process: it pays off with SimpleOCRWorker (e.g. a retried job, or the
+# same PDF with different margins), never across jobs of the forking OCRWorker.
+_HEADERS_CACHE: OrderedDict[tuple, Any] = OrderedDict()
+_HEADERS_CACHE_MAX_ENTRIES = 16
+
+
+def _content_digest(file_bytes: bytes) -> bytes:
+    return hashlib.blake2b(file_bytes, digest_size=16).digest()
+
+
+def _cache_get(cache: OrderedDict, key: tuple) -> Any:
+    value = cache.get(key)
+    if value is not None:
+        cache.move_to_end(key)
+    return value
+
+
+def _cache_put(cache: OrderedDict, key: tuple, value: Any, max_entries: int) -> None:
+    cache[key] = value
+    if len(cache) > max_entries:
+        cache.popitem(last=False)
+
+
+def _markdown_cache_put(key: tuple, md_text: str, metadata: dict[str, Any]) -> None:
+    if len(md_text) > _MARKDOWN_CACHE_MAX_CHARS:
+        return
+    _MARKDOWN_CACHE[key] = (md_text, metadata)
+    total_chars = sum(len(text) for text, _ in _MARKDOWN_CACHE.values())
+    while total_chars > _MARKDOWN_CACHE_MAX_CHARS or len(_MARKDOWN_CACHE) > _MARKDOWN_CACHE_MAX_ENTRIES:
+        _, (evicted_text, _) = _MARKDOWN_CACHE.popitem(last=False)
+        total_chars -= len(evicted_text)
+
+
+def _has_outline(doc: fitz.Document) -> bool:
+    """
+    Cheap probe for an outline (bookmark) root without walking the TOC.
 
-    Raises:
-        ValueError: On invalid input or extraction failure.
+    Older PyMuPDF returns None for a missing outline; newer releases wrap a null root instead.
     """
-    if not file_bytes:
-        raise ValueError("Empty PDF content")
+    outline = doc.outline
+    if outline is None:
+        return False
+    return getattr(getattr(outline, "this", None), "m_internal", True) is not None
 
-    cfg = config or _DEFAULT_CONFIG
 
+def _open_and_classify(
+    file_bytes: bytes,
+    digest: bytes,
+    cfg: ExtractionConfig,
+) -> tuple[fitz.Document, Any, dict[str, Any]]:
+    """
+    Open the PDF once and choose its header strategy.
+
+    Returns the open document, the header info object to render with, and the
+    header-related metadata fields. The caller owns (and must close) the document.
+    """
     try:
         doc = fitz.open(stream=file_bytes, filetype="pdf")
     except Exception as e:  # pragma: no cover - external library specifics
         raise ValueError(f"Failed to open PDF: {e}") from e
 
-    toc = doc.get_toc()
+    # get_toc() is the default simple form; skip it entirely when there is no outline root
+    toc = doc.get_toc() if _has_outline(doc) else []
     toc_entry_count = len(toc) if toc else 0
 
-    headers_strategy = ""
     header_levels_detected: Optional[int] = None
 
     try:
         if toc_entry_count > 0:
             headers_strategy = "toc"
-            toc_headers = pymupdf4llm.TocHeaders(doc)
-            md_text = pymupdf4llm.to_markdown(doc, hdr_info=toc_headers, margins=cfg.margins)
+            hdr_info = pymupdf4llm.TocHeaders(doc)
             # TOC format: list of [level, title, page_num]
             header_levels_detected = len({level for level, _, _ in toc})
             LOGGER.debug("Used TocHeaders with %d TOC entries", toc_entry_count)
         else:
             headers_strategy = "identify"
-            identified = pymupdf4llm.IdentifyHeaders(
-                doc,
-                max_levels=cfg.header_detection_max_levels,
-                body_limit=cfg.header_detection_body_limit,
-            )
-            md_text = pymupdf4llm.to_markdown(doc, hdr_info=identified, margins=cfg.margins)
-            # Attempt to extract distinct levels if the object exposes .headers
-            try:  # pragma: no cover - depends on library internals
-                header_levels_detected = len({h.level for h in identified.headers})  # type: ignore[attr-defined]
-            except Exception:
-                header_levels_detected = None
+            hdr_key = (digest, cfg.header_detection_max_levels, cfg.header_detection_body_limit)
+            hdr_info = _cache_get(_HEADERS_CACHE, hdr_key)
+            if hdr_info is None:
+                hdr_info = pymupdf4llm.IdentifyHeaders(
+                    doc,
+                    max_levels=cfg.header_detection_max_levels,
+                    body_limit=cfg.header_detection_body_limit,
+                )
+                _cache_put(_HEADERS_CACHE, hdr_key, hdr_info, _HEADERS_CACHE_MAX_ENTRIES)
+            # IdentifyHeaders maps font sizes to "#" prefixes; distinct prefixes are the levels
+            header_ids = getattr(hdr_info, "header_id", None)
+            if isinstance(header_ids, dict):
+                header_levels_detected = len(set(header_ids.values()))
             LOGGER.debug("Used IdentifyHeaders heuristic")
     except Exception as e:  # pragma: no cover - external library specifics
+        doc.close()
         raise ValueError(f"Markdown conversion failed: {e}") from e
 
-    write_path = _write_markdown_if_configured(md_text, original_filename, cfg)
-
-    metadata: dict[str, Any] = {
-        "pages": doc.page_count,
+    header_metadata = {
         "toc_entries": toc_entry_count,
         "headers_strategy": headers_strategy,
         "header_levels_detected": header_levels_detected,
+    }
+    return doc, hdr_info, header_metadata
+
+
+def _convert_pdf(file_bytes: bytes, digest: bytes, cfg: ExtractionConfig) -> tuple[str, dict[str, Any]]:
+    """
+    Convert PDF bytes to markdown, returning the text and the extraction metadata.
+    """
+    doc, hdr_info, header_metadata = _open_and_classify(file_bytes, digest, cfg)
+    with doc:
+        try:
+            md_text = _render(doc, file_bytes, hdr_info, cfg)
+        except Exception as e:  # pragma: no cover - external library specifics
+            raise ValueError(f"Markdown conversion failed: {e}") from e
+        page_count = doc.page_count
+
+    metadata: dict[str, Any] = {
+        "pages": page_count,
+        **header_metadata,
         "margins": {
             "left": cfg.margins[0],
             "top": cfg.margins[1],
             "right": cfg.margins[2],
             "bottom": cfg.margins[3],
         },
+    }
+    return md_text, metadata
+
+
+def extract_markdown_with_hierarchy(
+    file_bytes: bytes,
+    original_filename: str,
+    *,
+    config: Optional[ExtractionConfig] = None,
+) -> tuple[str, dict[str, Any]]:
+    """
+    Extract hierarchical Markdown from a PDF (bytes) using either the embedded
+    Table of Contents (TOC) or a heuristic header identification fallback.
+
+    Results are cached in-process by PDF content, so repeated extraction of the
+    same bytes with the same settings in the same process does not re-run PyMuPDF.
+    Under the forking RQ worker every job runs in a new process, so only
+    SimpleOCRWorker and direct callers benefit.
+
+    Args:
+        file_bytes: Raw PDF bytes.
+        original_filename: Original name (used only for generated markdown filename).
+        config: Optional ExtractionConfig. If omitted, environment-derived default is used.
+
+    Returns:
+        A tuple: (markdown_text, metadata_dict)
+
+    Raises:
+        ValueError: On invalid input or extraction failure.
+    """
+    if not file_bytes:
+        raise ValueError("Empty PDF content")
+    # Reject non-PDF payloads (e.g. an HTML error page) before hashing or opening them.
+    # Readers accept the header anywhere in the first 1024 bytes.
+    if b"%PDF-" not in file_bytes[:1024]:
+        raise ValueError("Not a PDF file (missing %PDF header)")
+
+    cfg = config or _DEFAULT_CONFIG
+
+    digest = _content_digest(file_bytes)
+    # only the fields that change the rendered markdown participate in the key
+    cache_key = (digest, cfg.margins, cfg.header_detection_max_levels, cfg.header_detection_body_limit)
+    cached = _cache_get(_MARKDOWN_CACHE, cache_key)
+    if cached is not None:
+        md_text, metadata = cached
+        LOGGER.debug("Markdown cache hit for %s", original_filename)
+    else:
+        md_text, metadata = _convert_pdf(file_bytes, digest, cfg)
+        _markdown_cache_put(cache_key, md_text, metadata)
+
+    write_path = _write_markdown_if_configured(md_text, original_filename, cfg)
+
+    metadata = {
+        **metadata,
         "output_path": write_path,
         "output_size_chars": len(md_text),
     }
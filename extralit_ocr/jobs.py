@@ -2,6 +2,8 @@
 RQ job for PDF extraction using PyMuPDF with S3 integration.
 """
 
+from __future__ import annotations
+
 import logging
 import time
 from datetime import UTC, datetime
@@ -11,15 +13,22 @@ from uuid import UUID
 from rq import get_current_job
 from rq.decorators import job
 
-from extralit_ocr.extract import extract_markdown_with_hierarchy
 from extralit_server.api.schemas.v1.document.metadata import DocumentProcessingMetadata
 from extralit_server.contexts.files import download_file_content, get_minio_client
 from extralit_server.database import SyncSessionLocal
 from extralit_server.jobs.queues import OCR_QUEUE, REDIS_CONNECTION
 from extralit_server.models.database import Document
 
+from extralit_ocr.results import compress_markdown
+
 _LOGGER = logging.getLogger(__name__)
 
+# Markdown longer than this is returned by file reference (when a write dir is configured)
+# instead of being pickled into the RQ result stored in Redis.
+_INLINE_MARKDOWN_MAX_CHARS = 1_000_000
+# Inline markdown longer than this is compressed in the result; see extralit_ocr.results.
+_COMPRESS_MARKDOWN_MIN_CHARS = 64_000
+
 
 @job(queue=OCR_QUEUE, connection=REDIS_CONNECTION, timeout=900, result_ttl=3600)
 def pymupdf_to_markdown_job(
@@ -36,7 +45,10 @@ def pymupdf_to_markdown_job(
         workspace_name: Workspace name for S3 operations
 
     Returns:
-        Dictionary with extraction results
+        Dictionary with extraction results. Markdown over 1M characters that was written to
+        PDF_MARKDOWN_WRITE_DIR is returned as "markdown_path"/"markdown_size" instead of "markdown";
+        other markdown over 64K characters is returned as base64-encoded zlib in "markdown_zlib_b64"
+        (use extralit_ocr.results.decompress_result()).
     """
     current_job = get_current_job()
     current_job.meta.update(
@@ -57,12 +69,21 @@ def pymupdf_to_markdown_job(
             raise Exception("Failed to get storage client")
 
         pdf_data = download_file_content(client, s3_url)
-        _LOGGER.info(f"Downloaded PDF from S3: {s3_url} ({len(pdf_data)} bytes)")
+        _LOGGER.info("Downloaded PDF from S3: %s (%d bytes)", s3_url, len(pdf_data))
+
+        # Surface progress while the (potentially long) extraction runs; save_meta writes only meta
+        current_job.meta["progress"] = {"stage": "extracting", "pdf_size_bytes": len(pdf_data)}
+        current_job.save_meta()
 
         # Step 2: Extract markdown using PyMuPDF
-        extraction_start = time.time()
+        # Imported here so enqueueing processes don't load MuPDF just to reference this job
+        from extralit_ocr.extract import extract_markdown_with_hierarchy
+
+        extraction_start_ns = time.monotonic_ns()
         markdown, extraction_metadata = extract_markdown_with_hierarchy(pdf_data, filename)
-        extraction_time = time.time() - extraction_start
+        extraction_time = (time.monotonic_ns() - extraction_start_ns) / 1e9
+        # Drop the PDF before the DB update so it doesn't stay resident alongside the markdown
+        del pdf_data
 
         # Step 3: Prepare results
         result = {
@@ -72,6 +93,13 @@ def pymupdf_to_markdown_job(
             "processing_time": extraction_time,
             "success": True,
         }
+        if len(markdown) > _INLINE_MARKDOWN_MAX_CHARS and extraction_metadata.get("output_path"):
+            del result["markdown"]
+            result["markdown_path"] = extraction_metadata["output_path"]
+            result["markdown_size"] = len(markdown)
+        elif len(markdown) > _COMPRESS_MARKDOWN_MIN_CHARS:
+            del result["markdown"]
+            result["markdown_zlib_b64"] = compress_markdown(markdown)
 
         # Step 4: Update document metadata in database
         with SyncSessionLocal() as db:
@@ -90,7 +118,7 @@ def pymupdf_to_markdown_job(
 
                 document.metadata_ = metadata.model_dump()
                 db.commit()
-                _LOGGER.info(f"Updated document {document_id} metadata with extraction results")
+                _LOGGER.info("Updated document %s metadata with extraction results", document_id)
 
         current_job.meta.update(
             {"completed_at": datetime.now(UTC).isoformat(), "success": True, "text_length": len(markdown)}
@@ -100,7 +128,7 @@ def pymupdf_to_markdown_job(
         return result
 
     except Exception as e:
-        _LOGGER.error(f"Error in PyMuPDF extraction for document {document_id}: {e}")
+        _LOGGER.error("Error in PyMuPDF extraction for document %s: %s", document_id, e)
         current_job.meta.update({"completed_at": datetime.now(UTC).isoformat(), "success": False, "error": str(e)})
         current_job.save_meta()
         raise
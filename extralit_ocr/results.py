@@ -0,0 +1,33 @@
+"""
+Encoding of markdown carried in OCR job results.
+
+Kept free of third-party imports so result consumers can decode job results without
+loading PyMuPDF or extralit-server.
+"""
+
+from __future__ import annotations
+
+import base64
+import zlib
+from typing import Any
+
+
+def compress_markdown(markdown: str) -> str:
+    """
+    zlib-compress markdown and base64-encode it, so the job result stays JSON-serializable.
+    """
+    # Markdown compresses several-fold; level 1 keeps the CPU cost negligible
+    return base64.b64encode(zlib.compress(markdown.encode("utf-8"), 1)).decode("ascii")
+
+
+def decompress_result(result: dict[str, Any]) -> dict[str, Any]:
+    """
+    Restore the "markdown" key of a pymupdf_to_markdown_job result stored as "markdown_zlib_b64".
+
+    Results without compressed markdown are returned unchanged.
+    """
+    if "markdown_zlib_b64" not in result:
+        return result
+    restored = {key: value for key, value in result.items() if key != "markdown_zlib_b64"}
+    restored["markdown"] = zlib.decompress(base64.b64decode(result["markdown_zlib_b64"])).decode("utf-8")
+    return restored
@@ -37,10 +37,15 @@ class ExtractionResponse(BaseModel):
     Response schema for PDF extraction operations.
 
     Contains the extracted markdown content along with comprehensive metadata
-    about the extraction process and results.
+    about the extraction process and results. Large markdown is carried by exactly
+    one of ``markdown``, ``markdown_path`` or ``markdown_zlib_b64`` (see
+    ``extralit_ocr.results.decompress_result``).
     """
 
-    markdown: str = Field(..., description="Extracted markdown content with hierarchical structure")
+    markdown: Optional[str] = Field(None, description="Extracted markdown content with hierarchical structure")
+    markdown_path: Optional[str] = Field(None, description="Path of the written markdown file, for very large output")
+    markdown_size: Optional[int] = Field(None, description="Size in characters of the markdown at markdown_path")
+    markdown_zlib_b64: Optional[str] = Field(None, description="Base64-encoded zlib-compressed markdown")
     metadata: PDFMetadata = Field(..., description="Metadata about the extraction process")
     filename: Optional[str] = Field(None, description="Original filename")
     processing_time: Optional[float] = Field(None, description="Processing time in seconds")
@@ -0,0 +1,24 @@
+"""
+RQ worker classes for the OCR queue.
+
+Importing this module loads PyMuPDF and pymupdf4llm, so when `rq worker-pool` resolves
+``--worker-class`` the native libraries are loaded once in the pool process. Workers and
+their per-job work horses inherit the loaded modules through fork instead of paying the
+import on each job.
+"""
+
+from rq.worker import SimpleWorker, Worker
+
+import extralit_ocr.extract  # noqa: F401  # preload MuPDF before workers fork
+
+
+class OCRWorker(Worker):
+    """
+    Forking worker (one work horse per job) with PyMuPDF preloaded.
+    """
+
+
+class SimpleOCRWorker(SimpleWorker):
+    """
+    In-process worker (no fork per job) with PyMuPDF preloaded.
+    """
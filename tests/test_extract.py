@@ -0,0 +1,115 @@
+import json
+import os
+import tempfile
+
+import fitz
+import pytest
+
+from extralit_ocr import extract
+from extralit_ocr.results import compress_markdown, decompress_result
+
+
+def _make_pdf(page_count, with_toc):
+    doc = fitz.open()
+    for i in range(page_count):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Chapter {i}", fontsize=24)
+        page.insert_text((72, 120), "Body text here. " * 5, fontsize=10)
+        page.insert_text((72, 160), f"Section {i}.1", fontsize=16)
+        page.insert_text((72, 200), "More body text. " * 5, fontsize=10)
+    if with_toc:
+        doc.set_toc([[1, f"Chapter {i}", i + 1] for i in range(page_count)])
+    return doc.tobytes()
+
+
+def test_spill_pdf_falls_back_to_temp_dir(monkeypatch, tmp_path):
+    shm_dir = tmp_path / "shm"
+    shm_dir.mkdir()
+    monkeypatch.setattr(extract, "_SHM_DIR", str(shm_dir))
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+
+    real_mkstemp = tempfile.mkstemp
+
+    def mkstemp(*args, dir=None, **kwargs):
+        if dir == str(shm_dir):
+            raise PermissionError("read-only /dev/shm")
+        return real_mkstemp(*args, dir=dir, **kwargs)
+
+    monkeypatch.setattr(tempfile, "mkstemp", mkstemp)
+
+    with extract._spill_pdf(b"%PDF-1.7 test") as path:
+        assert os.path.dirname(path) == str(tmp_path)
+        with open(path, "rb") as f:
+            assert f.read() == b"%PDF-1.7 test"
+    assert not os.path.exists(path)
+    assert not list(shm_dir.iterdir())
+
+
+def test_markdown_cache_bounded_by_chars(monkeypatch):
+    monkeypatch.setattr(extract, "_MARKDOWN_CACHE", extract.OrderedDict())
+    monkeypatch.setattr(extract, "_MARKDOWN_CACHE_MAX_CHARS", 10)
+
+    extract._markdown_cache_put(("a",), "x" * 6, {})
+    extract._markdown_cache_put(("b",), "x" * 4, {})
+    extract._markdown_cache_put(("c",), "x" * 11, {})  # larger than the whole cache
+    assert list(extract._MARKDOWN_CACHE) == [("a",), ("b",)]
+
+    extract._markdown_cache_put(("d",), "x" * 5, {})
+    assert list(extract._MARKDOWN_CACHE) == [("b",), ("d",)]
+
+
+def test_decompress_result_round_trip():
+    markdown = "# Title\n\nBody text with unicode: \u00e9\u00e8\u2014\n" * 5000
+    result = {"document_id": "abc", "markdown_zlib_b64": compress_markdown(markdown), "success": True}
+
+    json.dumps(result)  # status endpoints return the job result as JSON
+    assert decompress_result(result) == {"document_id": "abc", "markdown": markdown, "success": True}
+    assert decompress_result({"markdown": "x"}) == {"markdown": "x"}
+
+
+@pytest.mark.parametrize("with_toc", [True, False])
+def test_parallel_render_matches_serial(monkeypatch, with_toc):
+    monkeypatch.setattr(extract, "_MARKDOWN_CACHE", extract.OrderedDict())
+    pdf = _make_pdf(20, with_toc)
+    spills = []
+    real_spill_pdf = extract._spill_pdf
+
+    def spill_pdf(file_bytes):
+        spills.append(len(file_bytes))
+        return real_spill_pdf(file_bytes)
+
+    monkeypatch.setattr(extract, "_spill_pdf", spill_pdf)
+
+    serial, serial_meta = extract.extract_markdown_with_hierarchy(
+        pdf, "doc.pdf", config=extract.ExtractionConfig(page_workers=1)
+    )
+    assert not spills
+    extract._MARKDOWN_CACHE.clear()
+    parallel, parallel_meta = extract.extract_markdown_with_hierarchy(
+        pdf, "doc.pdf", config=extract.ExtractionConfig(page_workers=2)
+    )
+    assert spills  # rendered through the page pool
+    assert parallel == serial
+    assert parallel_meta == serial_meta
+
+
+@pytest.mark.parametrize("file_bytes", [b"<html><body>not a pdf</body></html>", b"\x89PNG\r\n\x1a\n" + b"\0" * 2048])
+def test_rejects_non_pdf_input(file_bytes):
+    with pytest.raises(ValueError, match="Not a PDF"):
+        extract.extract_markdown_with_hierarchy(file_bytes, "doc.pdf")
+
+
+def test_failed_write_leaves_no_temp_file(monkeypatch, tmp_path):
+    config = extract.ExtractionConfig(write_dir=tmp_path, safe_filename_timestamp=False)
+    out_path = extract._write_markdown_if_configured("first", "doc.pdf", config)
+
+    def failing_replace(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(extract.os, "replace", failing_replace)
+    with pytest.raises(OSError, match="disk full"):
+        extract._write_markdown_if_configured("second", "doc.pdf", config)
+
+    assert [p.name for p in tmp_path.iterdir()] == [os.path.basename(out_path)]
+    with open(out_path, encoding="utf-8") as f:
+        assert f.read() == "first"